@@ -1,9 +1,13 @@
 # agentlayer/cli.py
 
+import atexit
 import click
+import httpx
 import os
 import json
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
 import asyncio
 from datetime import datetime
 import yaml
@@ -13,8 +17,41 @@ import yaml
 # For Render deployment: your_render_service_url
 API_BASE_URL = os.getenv("API_BASE_URL", "http://127.0.0.1:8000")
 
+# Shared HTTP session so every command reuses pooled keep-alive connections
+# instead of paying a fresh TCP/TLS handshake per request.
+_SESSION = requests.Session()
+_ADAPTER = HTTPAdapter(pool_connections=4, pool_maxsize=8)
+_SESSION.mount("http://", _ADAPTER)
+_SESSION.mount("https://", _ADAPTER)
+atexit.register(_SESSION.close)
+
 # --- Utility Functions (Local) ---
 # These are kept minimal as main logic is in FastAPI and other modules
+
+# Prefer the libyaml C bindings when PyYAML was built with them.
+_YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+_YAML_DUMPER = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+
+# path -> (mtime_ns, parsed object)
+_YAML_CACHE = {}
+
+def _load_yaml_cached(path: str):
+    """Loads a YAML file, reusing the previous parse while its mtime is unchanged."""
+    mtime_ns = os.stat(path).st_mtime_ns
+    cached = _YAML_CACHE.get(path)
+    if cached is not None and cached[0] == mtime_ns:
+        return cached[1]
+    with open(path, "r", encoding="utf-8") as f:
+        data = yaml.load(f, Loader=_YAML_LOADER)
+    _YAML_CACHE[path] = (mtime_ns, data)
+    return data
+
+def _dump_yaml(path: str, data):
+    """Writes data as YAML and keeps the load cache in sync with the new file."""
+    with open(path, "w", encoding="utf-8") as f:
+        yaml.dump(data, f, Dumper=_YAML_DUMPER, indent=2, allow_unicode=True)
+    _YAML_CACHE[path] = (os.stat(path).st_mtime_ns, data)
+
 def _init_project_scaffold():
     """Initializes the agentlayer project structure."""
     base_dir = "agentlayer"
@@ -37,7 +74,7 @@ def _init_project_scaffold():
         "crew.py": "# CrewAI setup\n",
         "api.py": "# FastAPI app\n",
         "rule_checker.py": "# Constitution rule checker\n",
-        "log.json": "[]"
+        "log.jsonl": ""
     }
 
     for filename, content in files_to_create.items():
@@ -88,13 +125,14 @@ def run(input_text: str, role: str, model: str):
     """
     click.echo(f"Running agent with input: '{input_text}' (Role: {role}, Model: {model})...")
     try:
-        response = requests.post(
+        response = _SESSION.post(
             f"{API_BASE_URL}/run",
-            json={"input_text": input_text, "role": role, "llm_model": model},
+            data=orjson.dumps({"input_text": input_text, "role": role, "llm_model": model}),
+            headers={"Content-Type": "application/json"},
             timeout=120 # Increased timeout for LLM calls
         )
         response.raise_for_status()
-        result = response.json()
+        result = orjson.loads(response.content)
         
         click.echo("\n--- Agent Execution Result ---")
         click.echo(f"UUID: {result['uuid']}")
@@ -121,6 +159,52 @@ def run(input_text: str, role: str, model: str):
     except Exception as e:
         click.echo(f"❌ An unexpected error occurred: {e}")
 
+async def _post_runs(inputs, role: str, model: str, concurrency: int):
+    """Posts every input to /run concurrently over one pooled async client."""
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=API_BASE_URL, timeout=120, limits=limits) as client:
+        async def post_one(input_text: str):
+            response = await client.post(
+                "/run",
+                content=orjson.dumps({"input_text": input_text, "role": role, "llm_model": model}),
+                headers={"Content-Type": "application/json"}
+            )
+            response.raise_for_status()
+            return orjson.loads(response.content)
+
+        return await asyncio.gather(*(post_one(text) for text in inputs), return_exceptions=True)
+
+@cli.command('batch-run')
+@click.argument('input_file', type=click.File('r', encoding='utf-8'), default='-')
+@click.option('--role', default='developer', help='Role of the agent (e.g., developer, analyst).')
+@click.option('--model', default='deepseek-ai/DeepSeek-R1-Distill-Llama-70B-free', help='LLM model to use for the agent.')
+@click.option('--concurrency', default=32, show_default=True, help='Maximum number of requests in flight.')
+def batch_run(input_file, role: str, model: str, concurrency: int):
+    """
+    Runs the agent once per non-empty line of INPUT_FILE (default: stdin), sending requests concurrently.
+    """
+    inputs = [line.strip() for line in input_file if line.strip()]
+    if not inputs:
+        click.echo("⚠️ No inputs provided.")
+        return
+
+    click.echo(f"Running {len(inputs)} inputs (Role: {role}, Model: {model}, Concurrency: {concurrency})...")
+    results = asyncio.run(_post_runs(inputs, role, model, max(1, concurrency)))
+
+    click.echo("\n--- Batch Execution Results ---")
+    failures = 0
+    for i, (input_text, result) in enumerate(zip(inputs, results), start=1):
+        if isinstance(result, httpx.HTTPStatusError):
+            failures += 1
+            click.echo(f"[{i}] ❌ API Error: {result.response.status_code} - {result.response.text} (Input: '{input_text}')")
+        elif isinstance(result, Exception):
+            failures += 1
+            click.echo(f"[{i}] ❌ Error: {result} (Input: '{input_text}')")
+        else:
+            status = "❌" if result['violations'] else "✅"
+            click.echo(f"[{i}] UUID: {result['uuid']} | Score: {result['score']} / 100 {status} | Violations: {len(result['violations'])} | Input: '{input_text}'")
+    click.echo(f"\nCompleted: {len(inputs) - failures} succeeded, {failures} failed.")
+
 @cli.command('constitution-validate')
 def constitution_validate():
     """
@@ -133,14 +217,14 @@ def constitution_validate():
             click.echo(f"❌ Error: {constitution_path} not found. Run 'agentlayer init' first.")
             return
 
-        with open(constitution_path, "r", encoding="utf-8") as f:
-            rules = json.load(f).get("rules", [])
+        with open(constitution_path, "rb") as f:
+            rules = orjson.loads(f.read()).get("rules", [])
         
         click.echo("\n--- Constitution Rules ---")
         if not rules:
             click.echo("No rules defined in constitution.json. (Consider adding rules for effective governance.)")
         else:
-            click.echo(json.dumps(rules, indent=2, ensure_ascii=False))
+            click.echo(orjson.dumps(rules, option=orjson.OPT_INDENT_2).decode())
         
         # Basic structural validation
         for i, rule in enumerate(rules):
@@ -177,10 +261,9 @@ def agent_add(agent_name: str):
 
     config_path = "agentlayer/config.yaml"
     try:
-        with open(config_path, "r", encoding="utf-8") as f:
-            config = yaml.safe_load(f)
-            if not config:
-                config = {}
+        config = _load_yaml_cached(config_path)
+        if not config:
+            config = {}
         config['agents'] = config.get('agents', [])
         if agent_name not in config['agents']:
             config['agents'].append(agent_name)
@@ -189,13 +272,11 @@ def agent_add(agent_name: str):
         if 'default_agent' not in config:
             config['default_agent'] = agent_name
 
-        with open(config_path, "w", encoding="utf-8") as f:
-            yaml.dump(config, f, indent=2, allow_unicode=True)
+        _dump_yaml(config_path, config)
         click.echo(f"Updated {config_path} with agent '{agent_name}'.")
     except FileNotFoundError:
         click.echo(f"❌ Warning: {config_path} not found. Creating a new one.")
-        with open(config_path, "w", encoding="utf-8") as f:
-            yaml.dump({"default_agent": agent_name, "agents": [agent_name]}, f, indent=2, allow_unicode=True)
+        _dump_yaml(config_path, {"default_agent": agent_name, "agents": [agent_name]})
     except Exception as e:
         click.echo(f"❌ Error updating {config_path}: {e}")
 
@@ -208,12 +289,12 @@ def trace(trace_uuid: str):
     """
     click.echo(f"Tracing execution with UUID: {trace_uuid}...")
     try:
-        response = requests.get(f"{API_BASE_URL}/trace/{trace_uuid}", timeout=30)
+        response = _SESSION.get(f"{API_BASE_URL}/trace/{trace_uuid}", timeout=30)
         response.raise_for_status()
-        result = response.json()
+        result = orjson.loads(response.content)
         
         click.echo("\n--- Execution Trace ---")
-        click.echo(json.dumps(result, indent=2, ensure_ascii=False))
+        click.echo(orjson.dumps(result, option=orjson.OPT_INDENT_2).decode())
 
     except requests.exceptions.HTTPError as e:
         if e.response.status_code == 404:
@@ -232,9 +313,9 @@ def score():
     """
     click.echo("Calculating overall constitution score...")
     try:
-        response = requests.get(f"{API_BASE_URL}/score", timeout=30)
+        response = _SESSION.get(f"{API_BASE_URL}/score", timeout=30)
         response.raise_for_status()
-        result = response.json()
+        result = orjson.loads(response.content)
 
         click.echo("\n--- Overall Constitution Score ---")
         click.echo(f"Total Runs: {result['total_runs']}")
@@ -260,7 +341,7 @@ def report():
     """
     click.echo("Generating HTML report...")
     try:
-        response = requests.get(f"{API_BASE_URL}/report", timeout=60)
+        response = _SESSION.get(f"{API_BASE_URL}/report", timeout=60)
         response.raise_for_status()
         
         report_html_path = "agentlayer_report.html"
@@ -1,13 +1,16 @@
 # agentlayer/api.py
 
+import logging
 import os
-import json
-from uuid import uuid4
-from datetime import datetime
+import time
+from collections import Counter
+from html import escape
+from datetime import datetime, timezone
 from typing import Dict, Any, List, Optional
 from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
-from fastapi.responses import HTMLResponse, JSONResponse
+from pydantic import BaseModel, Field
+from fastapi.responses import HTMLResponse, ORJSONResponse
+from starlette.middleware.gzip import GZipMiddleware
 import uvicorn
 
 # Import custom modules
@@ -15,34 +18,41 @@ from . import rule_checker
 from . import llm_agent
 from . import logger
 from . import langflow # LangGraph workflow
+from . import ids
+from . import token_budget
+
+# Named _log because `logger` is the execution-log module imported above.
+_log = logging.getLogger("agentlayer.api")
+
+# Importing the app leaves logging to whoever runs it. uvicorn's --log-level only covers the uvicorn.*
+# loggers, so the Procfile and __main__ pass agentlayer/log_config.json, which adds an INFO handler
+# for the agentlayer.* namespace.
+LOG_CONFIG_PATH = "agentlayer/log_config.json"
 
 app = FastAPI(
     title="AgentLayer Constitution API",
     description="API for running AI agents with constitution validation and logging.",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
 
+# /report HTML is large and repetitive; compress anything over 1 KB for clients that accept gzip.
+app.add_middleware(GZipMiddleware, minimum_size=1024)
+
 # ✅ Fly.io Health Check용 루트 라우트
 @app.get("/", summary="Health Check")
 async def root():
     return {"message": "🟢 Fly.io FastAPI 서버 작동 중"}
 
-# FastAPI 애플리케이션 종료 시 httpx 클라이언트 종료
+# FastAPI 애플리케이션 종료 시 대기 중인 로그 기록 및 httpx 클라이언트 종료
 @app.on_event("shutdown")
 async def shutdown_event():
-    await llm_agent.client.aclose()
-    print("HTTPX client closed.")
-
-# Ensure the agentlayer directory exists for logs and constitution.json
-os.makedirs("agentlayer", exist_ok=True)
-
-# Ensure initial constitution.json and log.json are present
-initial_constitution_path = "agentlayer/constitution.json"
-initial_log_path = "agentlayer/log.json"
+    await logger.close_logs()
+    _log.info("Log writer flushed.")
+    await llm_agent.aclose()
+    _log.info("HTTPX client closed.")
 
-if not os.path.exists(initial_constitution_path):
-    with open(initial_constitution_path, "w", encoding="utf-8") as f:
-        f.write("""
+DEFAULT_CONSTITUTION = """
 {
     "rules": [
         {"id": "R1", "type": "keyword", "keywords": ["sudo", "rm -rf", "nuke", "delete files"], "severity": "high"},
@@ -50,17 +60,50 @@ if not os.path.exists(initial_constitution_path):
         {"id": "R3", "type": "keyword", "keywords": ["unethical", "harmful"], "severity": "critical"}
     ]
 }
-        """)
+"""
 
-if not os.path.exists(initial_log_path):
-    with open(initial_log_path, "w", encoding="utf-8") as f:
-        f.write("[]")
+def _create_if_missing(path: str, content: str):
+    # O_EXCL makes the existence check and the create one atomic call, so workers can't race.
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666) # Same mode as open(path, "w"), subject to umask
+    except FileExistsError:
+        return
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(content)
+
+def _ensure_bootstrap():
+    """
+    Ensures the agentlayer directory, an initial constitution.json and log.jsonl are present.
+    """
+    os.makedirs("agentlayer", exist_ok=True)
+    _create_if_missing(rule_checker.CONSTITUTION_PATH, DEFAULT_CONSTITUTION)
+    _create_if_missing(logger.LOG_PATH, "")
+
+@app.on_event("startup")
+async def startup_event():
+    _ensure_bootstrap()
+    rule_checker.load_constitution_rules() # Parse rules and build the keyword automaton before the first /run
+    token_budget.load_encoding() # Load (and, on first deploy, download) the tiktoken encoding off the request path
+
+_UTC = timezone.utc
+_REPORT_TS = (0, "") # (epoch second, formatted timestamp)
+
+def _report_timestamp() -> str:
+    """
+    Returns the report's generated-on time, formatting it at most once per second.
+    """
+    global _REPORT_TS
+    now = int(time.time())
+    if _REPORT_TS[0] != now:
+        _REPORT_TS = (now, datetime.fromtimestamp(now, _UTC).isoformat())
+    return _REPORT_TS[1]
 
 # Pydantic Input Model for /run endpoint
 class RunRequest(BaseModel):
     input_text: str
-    role: Optional[str] = "developer"
-    llm_model: Optional[str] = "deepseek-ai/DeepSeek-R1-Distill-Llama-70B-free"
+    role: str = "developer" # Not Optional: an explicit null is rejected with a 422 before the workflow runs
+    llm_model: str = "deepseek-ai/DeepSeek-R1-Distill-Llama-70B-free"
+    max_tokens: Optional[int] = Field(None, ge=1) # Output cap; defaults to token_budget.DEFAULT_MAX_TOKENS
 
 # Pydantic Response Model
 class RunResponse(BaseModel):
@@ -73,13 +116,59 @@ class RunResponse(BaseModel):
     violations: List[Dict[str, Any]]
     score: int
 
-# Build the LangGraph workflow
-agent_workflow = langflow.build_agent_workflow()
+# In-memory view of log.jsonl, indexed by UUID. The file is append-only, so refreshes
+# only parse the bytes written since the last read.
+_LOGS: List[Dict[str, Any]] = []
+_LOGS_BY_UUID: Dict[str, Dict[str, Any]] = {}
+_LOGS_INODE: Optional[int] = None  # None until the index has been built
+_LOGS_OFFSET = 0
+# Running /score aggregates over _LOGS, updated as entries are indexed.
+_SCORE_STATE: Dict[str, Any] = {"n": 0, "sum": 0, "counts": Counter()}
+
+def _index_log(log_entry: Dict[str, Any]):
+    log_uuid = log_entry.get("uuid")
+    if log_uuid:
+        if log_uuid in _LOGS_BY_UUID:
+            return # Already recorded in-process before it was read back from disk.
+        _LOGS_BY_UUID[log_uuid] = log_entry
+    _LOGS.append(log_entry)
+    _SCORE_STATE["n"] += 1
+    _SCORE_STATE["sum"] += log_entry.get("score", 0)
+    _SCORE_STATE["counts"].update(v.get("rule_id", "unknown") for v in log_entry.get("violations", ()))
+
+def _ensure_log_index() -> List[Dict[str, Any]]:
+    """
+    Returns the cached logs after picking up any records appended to log.jsonl since the last call.
+    """
+    global _LOGS, _LOGS_BY_UUID, _LOGS_INODE, _LOGS_OFFSET, _SCORE_STATE
+    try:
+        st = os.stat(logger.LOG_PATH)
+    except FileNotFoundError:
+        st = None
+    if st is None or st.st_ino != _LOGS_INODE or st.st_size < _LOGS_OFFSET:
+        # First load, or the file was removed, replaced or truncated: start over.
+        _LOGS, _LOGS_BY_UUID, _LOGS_OFFSET = [], {}, 0
+        _SCORE_STATE = {"n": 0, "sum": 0, "counts": Counter()}
+        _LOGS_INODE = st.st_ino if st is not None else None
+    if st is not None and st.st_size > _LOGS_OFFSET:
+        new_logs, _LOGS_OFFSET = logger.read_logs_since(_LOGS_OFFSET)
+        for log in new_logs:
+            _index_log(log)
+    return _LOGS
+
+def _record_log(log_entry: Dict[str, Any]):
+    """
+    Adds a run that the workflow just logged to the index so it is visible without a re-read.
+    The entry may still be queued in the background log writer; when it is later read back
+    from log.jsonl, the UUID dedupe in _index_log skips it.
+    """
+    _ensure_log_index()
+    _index_log(log_entry)
 
 @app.post("/run", response_model=RunResponse, summary="Run Agent with Constitution Check")
 async def run_agent(request: RunRequest):
-    log_id = str(uuid4())
-    timestamp = datetime.utcnow().isoformat()
+    log_id = ids.new_log_id()
+    timestamp = ids.now_iso()
 
     initial_state: langflow.AgentFlowState = {
         "input_text": request.input_text,
@@ -89,14 +178,15 @@ async def run_agent(request: RunRequest):
         "log_id": log_id,
         "timestamp": timestamp,
         "violations": [],
-        "score": 100
+        "score": 100,
+        "max_tokens": request.max_tokens
     }
 
-    print(f"Starting LangGraph workflow for UUID: {log_id}")
-    final_state = await agent_workflow.invoke(initial_state)
-    print(f"Completed LangGraph workflow for UUID: {log_id}")
+    _log.info("workflow start uuid=%s", log_id)
+    final_state = await langflow.get_agent_workflow().ainvoke(initial_state)
+    _log.info("workflow end uuid=%s", log_id)
 
-    return JSONResponse(content={
+    result = {
         "uuid": final_state["log_id"],
         "timestamp": final_state["timestamp"],
         "input": final_state["input_text"],
@@ -105,46 +195,115 @@ async def run_agent(request: RunRequest):
         "llm_model": final_state["llm_model"],
         "violations": final_state["violations"],
         "score": final_state["score"]
-    })
+    }
+    RunResponse.model_validate(result) # Fail before indexing so /score never counts a run the client didn't get
+    _record_log(result)
+    # Returned as a plain dict and encoded with ORJSONResponse.
+    return result
 
 @app.get("/score", summary="Get Overall Constitution Score")
 async def get_overall_score():
-    logs = logger.load_logs()
-    if not logs:
-        return {"total_runs": 0, "average_score": 100, "violation_summary": {}}
-
-    total_score_sum = sum(log.get("score", 0) for log in logs)
-    average_score = total_score_sum / len(logs)
-
-    violation_counts = {}
-    for log in logs:
-        for violation in log.get("violations", []):
-            rule_id = violation.get("rule_id", "unknown")
-            violation_counts[rule_id] = violation_counts.get(rule_id, 0) + 1
-
+    _ensure_log_index() # Folds in any newly appended runs; aggregates are maintained incrementally.
+    total_runs = _SCORE_STATE["n"]
     return {
-        "total_runs": len(logs),
-        "average_score": round(average_score, 2),
-        "violation_summary": violation_counts
+        "total_runs": total_runs,
+        "average_score": round(_SCORE_STATE["sum"] / total_runs, 2) if total_runs else 100,
+        "violation_summary": dict(_SCORE_STATE["counts"])
     }
 
 @app.get("/trace/{trace_uuid}", summary="Trace Specific Agent Execution")
 async def trace_execution(trace_uuid: str):
-    logs = logger.load_logs()
-    for log in logs:
-        if log.get("uuid") == trace_uuid:
-            return JSONResponse(content=log)
+    _ensure_log_index()
+    log = _LOGS_BY_UUID.get(trace_uuid)
+    if log is not None:
+        return ORJSONResponse(content=log)
     raise HTTPException(status_code=404, detail=f"Log with UUID '{trace_uuid}' not found.")
 
+# Static report markup, built once at import. The header carries __TS__/__N__ placeholders.
+_REPORT_HEADER_HTML = """<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<title>AgentLayer Execution Report</title>
+<style>
+  body { font-family: -apple-system, "Segoe UI", Roboto, sans-serif; margin: 2rem; background: #f7f7f9; color: #222; }
+  h1 { margin-bottom: 0.25rem; }
+  .metadata { color: #666; font-size: 0.9rem; }
+  .log-entry { background: #fff; border-left: 6px solid #ccc; border-radius: 4px; padding: 1rem; margin: 1rem 0; }
+  .log-entry.compliant { border-left-color: #2e9e4f; }
+  .log-entry.violated { border-left-color: #d64545; }
+  .score.pass { color: #2e9e4f; font-weight: bold; }
+  .score.fail { color: #d64545; font-weight: bold; }
+  pre { white-space: pre-wrap; word-break: break-word; background: #f0f0f3; padding: 0.5rem; border-radius: 4px; }
+</style>
+</head>
+<body>
+<h1>AgentLayer Execution Report</h1>
+<p class="metadata">Generated on: __TS__ &middot; Total runs: __N__</p>
+"""
+_REPORT_FOOTER_HTML = "</body>\n</html>\n"
+# %-style templates: printf formatting from a dict is cheaper per row than Template.substitute.
+_ROW_TMPL = """<div class="log-entry %(cls)s">
+  <h3>%(uuid)s</h3>
+  <p class="metadata">%(timestamp)s &middot; Role: %(role)s &middot; Model: %(llm_model)s</p>
+  <p><strong>Input:</strong></p>
+  <pre>%(input)s</pre>
+  <p><strong>Output:</strong></p>
+  <pre>%(output)s</pre>
+%(violations)s  <p>Score: <span class="score %(score_cls)s">%(score)s / 100</span></p>
+</div>
+"""
+_VIOLATIONS_HEADER_HTML = "  <p><strong>Violations:</strong></p>\n  <ul>\n"
+_VIOLATIONS_FOOTER_HTML = "  </ul>\n"
+_VIOLATION_TMPL = "    <li>%(rule_id)s (%(type)s): '%(trigger)s' &mdash; %(severity)s</li>\n"
+_ENTRY_CLASS = {True: "violated", False: "compliant"} # keyed on "has violations"
+_SCORE_CLASS = {True: "pass", False: "fail"} # keyed on "score > 70"
+
 @app.get("/report", response_class=HTMLResponse, summary="Generate HTML Report of Executions")
 async def generate_report():
-    logs = logger.load_logs()
-    html_content = """..."""  # 그대로 유지
+    logs = _ensure_log_index()
+
+    # Collect fragments and join once at the end; repeated str += is quadratic in report size.
+    parts: List[str] = [
+        _REPORT_HEADER_HTML.replace("__TS__", _report_timestamp()).replace("__N__", str(len(logs)))
+    ]
+    append = parts.append
+    for log in reversed(logs):
+        # Resolve the bound method once per entry instead of once per field.
+        g = log.get
+        violations = g("violations", [])
+        score = g("score", 100)
+        violations_html = ""
+        if violations:
+            items = [_VIOLATIONS_HEADER_HTML]
+            for violation in violations:
+                vg = violation.get
+                items.append(_VIOLATION_TMPL % {
+                    "rule_id": escape(str(vg("rule_id", "unknown"))),
+                    "type": escape(str(vg("type", ""))),
+                    "trigger": escape(str(vg("trigger", ""))),
+                    "severity": escape(str(vg("severity", "")))
+                })
+            items.append(_VIOLATIONS_FOOTER_HTML)
+            violations_html = "".join(items)
+        append(_ROW_TMPL % {
+            "cls": _ENTRY_CLASS[bool(violations)],
+            "uuid": escape(str(g("uuid", "N/A"))),
+            "timestamp": escape(str(g("timestamp", "N/A"))),
+            "role": escape(str(g("role", "N/A"))),
+            "llm_model": escape(str(g("llm_model", "N/A"))),
+            "input": escape(str(g("input", ""))),
+            "output": escape(str(g("output", ""))),
+            "violations": violations_html,
+            "score_cls": _SCORE_CLASS[score > 70],
+            "score": score
+        })
 
-    return HTMLResponse(content=html_content)
+    append(_REPORT_FOOTER_HTML)
+    return HTMLResponse(content="".join(parts))
 
 # ✅ 로컬 실행용 설정 (포트 8080 고정)
 if __name__ == "__main__":
     os.environ.setdefault("TOGETHER_API_KEY", "YOUR_TOGETHER_API_KEY_HERE")
     print("Running FastAPI app on http://0.0.0.0:8080")
-    uvicorn.run("agentlayer.api:app", host="0.0.0.0", port=8080)
+    uvicorn.run("agentlayer.api:app", host="0.0.0.0", port=8080, log_config=LOG_CONFIG_PATH)
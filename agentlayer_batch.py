@@ -0,0 +1,68 @@
+# agentlayer/batch.py
+
+import asyncio
+from typing import Any, Awaitable, Callable, List, Optional, Sequence
+
+from aiolimiter import AsyncLimiter
+
+# Import modules from agentlayer
+from . import llm_agent
+from . import langflow
+
+async def _gather_limited(
+    factories: Sequence[Callable[[], Awaitable[Any]]],
+    max_concurrency: int,
+    rpm: int
+) -> List[Any]:
+    """
+    Runs every coroutine factory concurrently, with at most `max_concurrency`
+    in flight and at most `rpm` started per minute. Results keep input order.
+    """
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+    limiter = AsyncLimiter(max(1, rpm), 60)
+
+    async def run_one(factory: Callable[[], Awaitable[Any]]) -> Any:
+        async with semaphore, limiter:
+            return await factory()
+
+    return await asyncio.gather(*(run_one(factory) for factory in factories))
+
+async def run_many(
+    prompts: Sequence[str],
+    model: str,
+    max_concurrency: int = 10,
+    rpm: int = 60,
+    max_tokens: Optional[int] = None
+) -> List[llm_agent.AgentState]:
+    """
+    Calls the LLM once per prompt concurrently, bounded by `max_concurrency`
+    and a token-bucket of `rpm` requests per minute (Together's rate limit).
+    `max_tokens` caps each completion as in llm_agent.call_llm_model.
+    Returns one AgentState per prompt, in input order.
+    """
+    return await _gather_limited(
+        [
+            lambda prompt=prompt: llm_agent.call_llm_model({"prompt": prompt, "result": None}, model, max_tokens)
+            for prompt in prompts
+        ],
+        max_concurrency,
+        rpm
+    )
+
+async def invoke_many(
+    states: Sequence[langflow.AgentFlowState],
+    graph: Optional[Any] = None,
+    max_concurrency: int = 10,
+    rpm: int = 60
+) -> List[langflow.AgentFlowState]:
+    """
+    Runs the full LangGraph workflow (LLM, constitution check, logging) for
+    each initial state concurrently under the same limits as run_many.
+    Each workflow run makes one LLM call. Returns final states in input order.
+    """
+    graph = graph or langflow.get_agent_workflow()
+    return await _gather_limited(
+        [lambda state=state: graph.ainvoke(state) for state in states],
+        max_concurrency,
+        rpm
+    )
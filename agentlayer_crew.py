@@ -1,17 +1,25 @@
 # agentlayer/crew.py
 
+import functools
+import logging
 import os
 from crewai import Agent, Task, Crew, Process
 from langchain_community.llms import Together
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 
 # Import rule_checker for constitution validation within the crew's output
 from . import rule_checker
 from . import logger
+from . import token_budget
 
 # Ensure TOGETHER_API_KEY is set in environment for CrewAI to use Langchain Together LLM
 TOGETHER_API_KEY = os.getenv("TOGETHER_API_KEY")
 
+# CrewAI's verbose mode prints every step; keep it off unless AGENTLAYER_VERBOSE=1.
+VERBOSE = os.getenv("AGENTLAYER_VERBOSE", "0") == "1"
+
+_log = logging.getLogger("agentlayer.crew")
+
 if not TOGETHER_API_KEY:
     print("Warning: TOGETHER_API_KEY environment variable not set for CrewAI. CrewAI agents might not function.")
 
@@ -22,7 +30,7 @@ together_llm = Together(
     model="deepseek-ai/DeepSeek-R1-Distill-Llama-70B-free",
     together_api_key=TOGETHER_API_KEY,
     temperature=0.7,
-    max_tokens=512,
+    max_tokens=token_budget.DEFAULT_MAX_TOKENS,
     top_p=0.9
 )
 
@@ -31,26 +39,15 @@ developer_agent = Agent(
     role='Developer',
     goal='Write precise and efficient code snippets based on user requests, ensuring best practices.',
     backstory="You are a seasoned software engineer known for your clean code and problem-solving abilities. You always consider security and compliance.",
-    verbose=True,
-    llm=together_llm,
-    allow_delegation=False
-)
-
-analyst_agent = Agent(
-    role='Analyst',
-    goal='Review code and output for compliance with constitutional rules, security, and ethical guidelines.',
-    backstory="You are a meticulous security and compliance analyst. Your job is to ensure that all generated content adheres to the defined constitution and ethical standards.",
-    verbose=True,
+    verbose=VERBOSE,
     llm=together_llm,
     allow_delegation=False
 )
 
 # Define a custom task execution function to include constitution checks
-def compliance_check_task_execution(code_or_output: str, request_input: str, role: str) -> Dict[str, Any]:
-    """
-    Performs constitution checks on the generated content.
-    Returns a dictionary with compliance status and violations.
-    """
+@functools.lru_cache(maxsize=1024)
+def _compliance_impl(request_input: str, code_or_output: str, role: str, rules_version: Optional[Tuple[str, int]]) -> Dict[str, Any]:
+    # rules_version is part of the cache key only, so an edited constitution.json misses the cache.
     rules = rule_checker.load_constitution_rules()
     violations = rule_checker.check_violations(request_input, code_or_output, role, rules)
     
@@ -65,80 +62,95 @@ def compliance_check_task_execution(code_or_output: str, request_input: str, rol
     }
     return result
 
+def compliance_check_task_execution(code_or_output: str, request_input: str, role: str) -> Dict[str, Any]:
+    """
+    Performs constitution checks on the generated content.
+    Returns a dictionary with compliance status and violations.
+    Compliance is enforced here, in code, against constitution.json — not by an LLM reviewing
+    its own output, which would cost another round-trip and could give a different verdict per run.
+    Results are memoized per (input, output, role) until the constitution changes.
+    """
+    result = _compliance_impl(request_input, code_or_output, role, rule_checker.rules_version())
+    # Copy down to the violation dicts: callers may mutate their result without touching the cache.
+    return {**result, "violations": [dict(violation) for violation in result["violations"]]}
 
-# Main function to run the crew
-def run_crew(user_request: str, agent_role: str = "developer") -> Dict[str, Any]:
+
+def _build_crew(user_request: str) -> Crew:
     """
-    Runs the CrewAI multi-agent system and returns the result including constitution checks.
+    Builds the single-agent crew for a request around the shared developer_agent. Compliance is
+    checked in Python after kickoff, so there is no analyst agent spending a second LLM call on a
+    review that would be discarded.
+
+    The Task and Crew are per call on purpose: kickoff stores the interpolated description and the
+    task output on them, so a module-level crew can't be shared across threads or concurrent runs,
+    and Crew.copy() rebuilds the agents and tasks anyway.
     """
-    # Task 1: Developer writes the code/response
     developer_task = Task(
         description=f"Based on the user request '{user_request}', write a concise and safe code snippet or response. Focus on the core requirement.",
         expected_output="A clean, concise code snippet or a direct textual response.",
         agent=developer_agent
     )
 
-    # Task 2: Analyst reviews the developer's output for compliance
-    analyst_task = Task(
-        description="Review the generated content for any constitution violations (e.g., forbidden keywords, role non-compliance). Provide feedback on compliance.",
-        expected_output="A review indicating if the content is compliant or listing all detected violations and their severity. If compliant, state 'Compliant'. If violated, list violations.",
-        agent=analyst_agent,
-        context=[developer_task], # Analyst reviews Developer's output
-        callback=lambda x: compliance_check_task_execution(x, user_request, agent_role) # Apply constitution check here
+    return Crew(
+        agents=[developer_agent],
+        tasks=[developer_task],
+        verbose=2 if VERBOSE else 0, # Detailed logging only when AGENTLAYER_VERBOSE=1
+        process=Process.sequential
     )
 
-    # Instantiate the Crew with a sequential process
-    project_crew = Crew(
-        agents=[developer_agent, analyst_agent],
-        tasks=[developer_task, analyst_task],
-        verbose=2, # Detailed logging
-        process=Process.sequential # Developer -> Analyst
-    )
+def _crew_response(user_request: str, agent_role: str, crew_output: Any) -> Dict[str, Any]:
+    developer_final_output_str = str(crew_output) # The content developer produced
+    compliance_summary = compliance_check_task_execution(developer_final_output_str, user_request, agent_role)
+    return {
+        "input": user_request,
+        "role": agent_role,
+        "crew_output": developer_final_output_str,
+        "compliance_check": compliance_summary # Structured compliance details
+    }
+
+def _crew_error(user_request: str, agent_role: str, e: Exception) -> Dict[str, Any]:
+    _log.error("Error during crew execution: %s", e)
+    return {
+        "input": user_request,
+        "role": agent_role,
+        "crew_output": f"Error: {str(e)}",
+        "compliance_check": {
+            "compliance_status": "ERROR",
+            "violations": [],
+            "score": 0
+        }
+    }
 
-    print(f"\n--- Running Crew for request: '{user_request}' with role: '{agent_role}' ---")
+# Main function to run the crew
+def run_crew(user_request: str, agent_role: str = "developer") -> Dict[str, Any]:
+    """
+    Runs the CrewAI developer agent and returns the result including constitution checks.
+    The crew makes one LLM call; compliance_check_task_execution then checks its output.
+    """
+    _log.debug("Running Crew for request: '%s' with role: '%s'", user_request, agent_role)
     
+    project_crew = _build_crew(user_request)
     try:
-        # The result of the last task (analyst_task) will be returned
-        # The callback ensures compliance check results are embedded in the final output
         final_result = project_crew.kickoff()
-        print("\n--- Crew Execution Finished ---")
-        
-        # Extract the compliance check result from the analyst's task output
-        # The callback returns a dict, so we need to ensure this is parsed correctly.
-        # CrewAI's kickoff returns the *string output* of the last task, not the callback's raw return.
-        # So we need to ensure the analyst_task output explicitly states compliance.
-        # For full structured output, it's better to process the content AFTER kickoff.
-
-        # Let's manually run the compliance check on the developer's final output for structured result
-        developer_final_output_str = final_result # Assuming final_result is the developer's output string as reviewed by analyst
-        
-        # The analyst's output is the 'review' string, not the structured compliance dict from callback
-        # We need to rerun the check on the actual generated content for structured data
-        compliance_summary = compliance_check_task_execution(developer_final_output_str, user_request, agent_role)
-        
-        # Create a structured response
-        response_data = {
-            "input": user_request,
-            "role": agent_role,
-            "crew_output": developer_final_output_str, # The content developer produced
-            "compliance_check": compliance_summary # Structured compliance details
-        }
-        return response_data
+        _log.debug("Crew Execution Finished")
+        return _crew_response(user_request, agent_role, final_result)
+    except Exception as e:
+        return _crew_error(user_request, agent_role, e)
 
+async def run_crew_async(user_request: str, agent_role: str = "developer") -> Dict[str, Any]:
+    """
+    Async variant of run_crew using Crew.kickoff_async, so batch callers can run several
+    requests concurrently with asyncio.gather. Like run_crew, each call builds its own crew.
+    """
+    project_crew = _build_crew(user_request)
+    try:
+        final_result = await project_crew.kickoff_async()
+        return _crew_response(user_request, agent_role, final_result)
     except Exception as e:
-        print(f"Error during crew execution: {e}")
-        return {
-            "input": user_request,
-            "role": agent_role,
-            "crew_output": f"Error: {str(e)}",
-            "compliance_check": {
-                "compliance_status": "ERROR",
-                "violations": [],
-                "score": 0
-            }
-        }
+        return _crew_error(user_request, agent_role, e)
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.DEBUG)
     # Ensure TOGETHER_API_KEY is set in environment for local testing
     os.environ["TOGETHER_API_KEY"] = os.getenv("TOGETHER_API_KEY", "YOUR_TOGETHER_API_KEY_HERE")
     if os.environ["TOGETHER_API_KEY"] == "YOUR_TOGETHER_API_KEY_HERE":
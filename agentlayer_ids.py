@@ -0,0 +1,21 @@
+# agentlayer/ids.py
+
+import secrets
+import time
+from datetime import datetime, timezone
+
+_UTC = timezone.utc
+
+def new_log_id() -> str:
+    """
+    Returns a new execution log ID: nanosecond timestamp in hex plus 48 random bits.
+    IDs sort by creation time and are cheaper to make than str(uuid.uuid4()).
+    """
+    return f"{time.time_ns():x}{secrets.token_hex(6)}"
+
+def now_iso() -> str:
+    """
+    Returns the current UTC time as a timezone-aware ISO 8601 string, to the second.
+    """
+    # datetime.utcnow() is deprecated as of Python 3.12.
+    return datetime.now(_UTC).isoformat(timespec="seconds")
@@ -2,14 +2,17 @@
 
 import os
 import json
+import logging
 from typing import Dict, Any, List, Optional, TypedDict
 from langgraph.graph import StateGraph, END
-from datetime import datetime
 
 # Import modules from agentlayer
 from . import llm_agent
 from . import rule_checker
 from . import logger
+from . import ids
+
+_log = logging.getLogger("agentlayer.langflow")
 
 # Define the state for LangGraph
 class AgentFlowState(TypedDict):
@@ -21,26 +24,30 @@ class AgentFlowState(TypedDict):
     timestamp: str
     violations: List[Dict[str, Any]]
     score: int
+    max_tokens: Optional[int] # Output cap for the LLM call; None uses token_budget.DEFAULT_MAX_TOKENS
 
 # Node 1: Process Input with LLM
-async def process_with_llm_node(state: AgentFlowState) -> AgentFlowState:
+async def process_with_llm_node(state: AgentFlowState) -> Dict[str, Any]:
     """
     Calls the LLM agent to process the input text.
     """
-    print(f"🧠 LangGraph Node: Processing with LLM ({state['llm_model']})...")
+    _log.debug("🧠 LangGraph Node: Processing with LLM (%s)...", state["llm_model"])
     llm_state = {"prompt": state["input_text"], "result": None}
-    updated_llm_state = await llm_agent.call_llm_model(llm_state, state["llm_model"])
-    
-    new_state = state.copy()
-    new_state["output_text"] = updated_llm_state.get("result", "Error: LLM did not produce output.")
-    return new_state
+    # Watch the stream for high/critical keywords so a violating generation stops early.
+    scanner = rule_checker.KeywordStreamScanner(rule_checker.load_constitution_rules())
+    updated_llm_state = await llm_agent.call_llm_model(
+        llm_state, state["llm_model"], max_tokens=state.get("max_tokens"), scanner=scanner
+    )
+
+    # Nodes return only the keys they change; LangGraph merges them into the state.
+    return {"output_text": updated_llm_state.get("result", "Error: LLM did not produce output.")}
 
 # Node 2: Apply Constitution Checks
-def apply_constitution_check_node(state: AgentFlowState) -> AgentFlowState:
+def apply_constitution_check_node(state: AgentFlowState) -> Dict[str, Any]:
     """
     Applies constitution rules to the LLM's output.
     """
-    print("📜 LangGraph Node: Applying Constitution Checks...")
+    _log.debug("📜 LangGraph Node: Applying Constitution Checks...")
     rules = rule_checker.load_constitution_rules()
     violations = rule_checker.check_violations(
         state["input_text"],
@@ -50,17 +57,15 @@ def apply_constitution_check_node(state: AgentFlowState) -> AgentFlowState:
     )
     score = max(0, 100 - len(violations) * 10) # Simple scoring
 
-    new_state = state.copy()
-    new_state["violations"] = violations
-    new_state["score"] = score
-    return new_state
+    return {"violations": violations, "score": score}
 
 # Node 3: Log the Result
-def log_result_node(state: AgentFlowState) -> AgentFlowState:
+async def log_result_node(state: AgentFlowState) -> Dict[str, Any]:
     """
-    Logs the final state of the agent's execution.
+    Queues the final state of the agent's execution for the background log writer.
+    The disk write happens off the request path; see logger.enqueue_log.
     """
-    print("📝 LangGraph Node: Logging Result...")
+    _log.debug("📝 LangGraph Node: Logging Result...")
     log_entry = {
         "uuid": state["log_id"],
         "timestamp": state["timestamp"],
@@ -72,12 +77,10 @@ def log_result_node(state: AgentFlowState) -> AgentFlowState:
         "score": state["score"]
     }
     
-    logs = logger.load_logs()
-    logs.append(log_entry)
-    logger.save_logs(logs)
+    logger.enqueue_log(log_entry)
 
-    print(f"✅ Execution logged with UUID: {state['log_id']}")
-    return state
+    _log.debug("✅ Execution queued for logging with UUID: %s", state["log_id"])
+    return {}
 
 # Build the LangGraph workflow
 def build_agent_workflow():
@@ -96,10 +99,23 @@ def build_agent_workflow():
 
     return workflow.compile()
 
+_compiled_graph = None
+
+def get_agent_workflow():
+    """
+    Returns the compiled workflow, building it on first use. Compiled graphs are stateless
+    between invocations, so one is shared by all runs; set _compiled_graph = None to force a rebuild.
+    """
+    global _compiled_graph
+    if _compiled_graph is None:
+        _compiled_graph = build_agent_workflow()
+    return _compiled_graph
+
 # Example usage for direct testing (if needed, typically run via API or CLI)
 if __name__ == "__main__":
     import asyncio
-    import uuid
+
+    logging.basicConfig(level=logging.DEBUG)
 
     async def test_langgraph_flow():
         # Ensure dummy files exist for testing
@@ -113,8 +129,8 @@ if __name__ == "__main__":
     ]
 }
             """)
-        with open("agentlayer/log.json", "w", encoding="utf-8") as f:
-            f.write("[]")
+        with open(logger.LOG_PATH, "w", encoding="utf-8") as f:
+            f.write("")
         
         # IMPORTANT: Set your TOGETHER_API_KEY for testing
         os.environ["TOGETHER_API_KEY"] = os.getenv("TOGETHER_API_KEY", "YOUR_TOGETHER_API_KEY_HERE")
@@ -122,7 +138,7 @@ if __name__ == "__main__":
             print("Please set TOGETHER_API_KEY environment variable for full testing.")
             return
 
-        graph = build_agent_workflow()
+        graph = get_agent_workflow()
 
         print("\n--- Running LangGraph Flow Test 1 (Compliant) ---")
         initial_state1: AgentFlowState = {
@@ -130,12 +146,12 @@ if __name__ == "__main__":
             "output_text": None,
             "role": "developer",
             "llm_model": "deepseek-ai/DeepSeek-R1-Distill-Llama-70B-free",
-            "log_id": str(uuid.uuid4()),
-            "timestamp": datetime.utcnow().isoformat(),
+            "log_id": ids.new_log_id(),
+            "timestamp": ids.now_iso(),
             "violations": [],
             "score": 100
         }
-        final_state1 = await graph.invoke(initial_state1)
+        final_state1 = await graph.ainvoke(initial_state1)
         print(f"Final State 1: {final_state1}")
         print(f"Violations 1: {final_state1['violations']}")
         print(f"Score 1: {final_state1['score']}")
@@ -146,14 +162,16 @@ if __name__ == "__main__":
             "output_text": None,
             "role": "analyst", # Role not allowed by R2, keyword 'illegal'
             "llm_model": "deepseek-ai/DeepSeek-R1-Distill-Llama-70B-free",
-            "log_id": str(uuid.uuid4()),
-            "timestamp": datetime.utcnow().isoformat(),
+            "log_id": ids.new_log_id(),
+            "timestamp": ids.now_iso(),
             "violations": [],
             "score": 100
         }
-        final_state2 = await graph.invoke(initial_state2)
+        final_state2 = await graph.ainvoke(initial_state2)
         print(f"Final State 2: {final_state2}")
         print(f"Violations 2: {final_state2['violations']}")
         print(f"Score 2: {final_state2['score']}")
 
+        await logger.close_logs()
+
     asyncio.run(test_langgraph_flow())
@@ -2,7 +2,11 @@
 
 import os
 import httpx
-from typing import TypedDict, Optional, Dict, Any
+import orjson
+from typing import TypedDict, Optional, Dict, Any, Protocol
+from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_exponential_jitter
+
+from . import token_budget
 
 class AgentState(TypedDict):
     prompt: str
@@ -12,12 +16,123 @@ class AgentState(TypedDict):
 TOGETHER_API_KEY = os.getenv("TOGETHER_API_KEY")
 TOGETHER_API_BASE = "https://api.together.xyz/v1/chat/completions"
 
-client = httpx.AsyncClient()
+# Shared client: HTTP/2 multiplexing plus a keep-alive pool, so warm calls skip the TCP/TLS handshake
+# and concurrent /run requests share connections.
+# Auth and content-type headers are set once on the client rather than rebuilt per call.
+_DEFAULT_HEADERS = {"Content-Type": "application/json"}
+if TOGETHER_API_KEY:
+    _DEFAULT_HEADERS["Authorization"] = f"Bearer {TOGETHER_API_KEY}"
+
+client = httpx.AsyncClient(
+    http2=True,
+    timeout=httpx.Timeout(60.0, connect=5.0),
+    limits=httpx.Limits(max_connections=100, max_keepalive_connections=50, keepalive_expiry=60.0),
+    headers=_DEFAULT_HEADERS
+)
+
+async def aclose():
+    """
+    Closes the shared HTTP client. Called from the API's shutdown hook.
+    """
+    await client.aclose()
+
+# Rate limits and transient upstream failures are retried; other 4xx responses fail immediately.
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+MAX_RETRY_AFTER = 30.0 # seconds; caps a server-supplied Retry-After
+
+class RetryableStatus(Exception):
+    """
+    Raised for a Together API response whose status code is worth retrying.
+    """
+    def __init__(self, response: httpx.Response):
+        super().__init__(f"{response.status_code} - {response.text}")
+        self.response = response
+        self.retry_after = _parse_retry_after(response.headers.get("Retry-After"))
+
+def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+    # Only the delay-seconds form is honored; an HTTP-date falls back to exponential backoff.
+    if not value:
+        return None
+    try:
+        return min(max(float(value), 0.0), MAX_RETRY_AFTER)
+    except ValueError:
+        return None
+
+_backoff = wait_exponential_jitter(initial=0.5, max=8)
+
+def _retry_wait(retry_state) -> float:
+    exc = retry_state.outcome.exception()
+    if isinstance(exc, RetryableStatus) and exc.retry_after is not None:
+        return exc.retry_after
+    return _backoff(retry_state)
+
+@retry(
+    stop=stop_after_attempt(3),
+    wait=_retry_wait,
+    retry=retry_if_exception_type((httpx.RequestError, RetryableStatus)),
+    reraise=True
+)
+async def _open_stream(payload: Dict[str, Any]) -> httpx.Response:
+    """
+    Starts one streaming chat-completion request and returns the open response once its status is OK.
+    Establishing the stream is retried with backoff on network errors, 429 and 5xx; the caller closes it.
+    """
+    request = client.build_request("POST", TOGETHER_API_BASE, json=payload)
+    response = await client.send(request, stream=True)
+    if response.status_code >= 400:
+        await response.aread() # Error bodies are small; read them so the exception can report them
+        await response.aclose()
+        if response.status_code in RETRYABLE_STATUS_CODES:
+            raise RetryableStatus(response)
+        response.raise_for_status()
+    return response
+
+class StreamScanner(Protocol):
+    def feed(self, chunk: str) -> Optional[str]: ...
 
-async def call_llm_model(state: AgentState, model_name: str) -> AgentState:
+def _sse_event(line: str) -> Optional[Dict[str, Any]]:
+    """
+    Parses one server-sent-event line from Together's OpenAI-style stream ("data: {json}",
+    ending with "data: [DONE]"). Returns None for non-data lines, the end marker, and frames
+    that aren't a JSON object, so one bad frame doesn't discard the text streamed so far.
+    """
+    if not line.startswith("data:"):
+        return None
+    data = line[5:].strip()
+    if not data or data == "[DONE]":
+        return None
+    try:
+        event = orjson.loads(data)
+    except orjson.JSONDecodeError:
+        return None
+    return event if isinstance(event, dict) else None
+
+def _event_delta(event: Dict[str, Any]) -> Optional[str]:
+    choices = event.get("choices") or []
+    if not choices:
+        return None
+    return (choices[0].get("delta") or {}).get("content") or choices[0].get("text")
+
+def _event_error(event: Dict[str, Any]) -> Optional[str]:
+    # Errors after the stream has started arrive as a {"error": {...}} frame on a 200 response.
+    error = event.get("error")
+    if not error:
+        return None
+    return str(error.get("message") or error) if isinstance(error, dict) else str(error)
+
+async def call_llm_model(
+    state: AgentState,
+    model_name: str,
+    max_tokens: Optional[int] = None,
+    scanner: Optional[StreamScanner] = None
+) -> AgentState:
     """
     Together AI의 LLM을 호출하여 프롬프트에 대한 응답을 생성합니다.
     사용자가 지정한 llm_model을 사용합니다.
+    Long prompts are trimmed to token_budget.DEFAULT_MAX_INPUT_TOKENS; `max_tokens` caps the output
+    (token_budget.DEFAULT_MAX_TOKENS if omitted).
+    The completion is streamed. If `scanner` (e.g. a rule_checker.KeywordStreamScanner) reports a
+    keyword in the generated text, the stream is closed early and the text so far is returned.
     """
     prompt = state["prompt"]
     if not prompt:
@@ -28,37 +143,50 @@ async def call_llm_model(state: AgentState, model_name: str) -> AgentState:
 
     try:
         messages = [
-            {"role": "user", "content": prompt},
+            {"role": "user", "content": token_budget.trim_prompt(prompt)},
         ]
 
         payload = {
             "model": model_name,
             "messages": messages,
-            "max_tokens": 512,
+            "max_tokens": max_tokens or token_budget.DEFAULT_MAX_TOKENS,
             "temperature": 0.7,
             "top_p": 0.9,
-            "stream": False
+            "stream": True
         }
 
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {TOGETHER_API_KEY}"
-        }
-
-        response = await client.post(TOGETHER_API_BASE, json=payload, headers=headers, timeout=60.0)
-        response.raise_for_status()
-
-        response_data = response.json()
-        
-        if response_data and response_data.get("choices"):
-            generated_text = response_data["choices"][0]["message"]["content"]
-            return {**state, "result": generated_text.strip()}
-        else:
-            return {**state, "result": f"❌ LLM API did not return valid choices: {response_data}"}
+        response = await _open_stream(payload)
+        parts = []
+        blocked = None
+        try:
+            async for line in response.aiter_lines():
+                event = _sse_event(line)
+                if event is None:
+                    continue
+                error = _event_error(event)
+                if error is not None:
+                    return {**state, "result": f"❌ Together AI API returned an error: {response.status_code} - {error}"}
+                delta = _event_delta(event)
+                if not delta:
+                    continue
+                parts.append(delta)
+                if scanner is not None:
+                    blocked = scanner.feed(delta)
+                    if blocked is not None:
+                        break # Closing the response below aborts the generation
+        finally:
+            await response.aclose()
+
+        if not parts:
+            return {**state, "result": "❌ LLM API did not return any streamed content."}
+        generated_text = "".join(parts).strip()
+        if blocked is not None:
+            generated_text += f"\n\n⛔ Generation stopped: output matched constitution keyword '{blocked}'."
+        return {**state, "result": generated_text}
 
     except httpx.RequestError as e:
         return {**state, "result": f"❌ Network error contacting Together AI: {str(e)}"}
-    except httpx.HTTPStatusError as e:
+    except (httpx.HTTPStatusError, RetryableStatus) as e:
         return {**state, "result": f"❌ Together AI API returned an error: {e.response.status_code} - {e.response.text}"}
     except Exception as e:
         return {**state, "result": f"❌ Unexpected error during LLM generation: {str(e)}"}
@@ -95,6 +223,6 @@ if __name__ == "__main__":
             else:
                 print(f"Test for {model_to_use} PASSED.")
         
-        await client.aclose() # 클라이언트 종료
+        await aclose() # 클라이언트 종료
 
     asyncio.run(test_call_llm_model_main())
@@ -1,44 +1,240 @@
 # agentlayer/logger.py
 
-import json
 import os
-from typing import List, Dict, Any
+import asyncio
+import contextlib
+import logging
+import orjson
+from typing import Iterator, List, Dict, Any, Optional, Tuple
 
-def load_logs() -> List[Dict[str, Any]]:
+try:
+    import fcntl
+except ImportError: # Windows: no advisory file locking
+    fcntl = None
+
+# One JSON object per line: appends never rewrite earlier records.
+LOG_PATH = "agentlayer/log.jsonl"
+
+_log = logging.getLogger("agentlayer.logger")
+
+@contextlib.contextmanager
+def _log_lock(exclusive: bool):
+    """
+    Holds an advisory flock on log.jsonl.lock. Appends take it shared; rewrites (compaction,
+    rotation, save_logs) take it exclusive, so no append from any process can land between a
+    rewrite's read and its rename. Each call opens its own descriptor: flock on a shared
+    descriptor would not exclude other threads of this process.
+    """
+    if fcntl is None:
+        yield
+        return
+    with open(LOG_PATH + ".lock", "ab") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        yield # Closing the file releases the lock
+
+def _parse_lines(data: bytes) -> List[Dict[str, Any]]:
+    entries = []
+    for line in data.splitlines():
+        if not line.strip():
+            continue
+        try:
+            entries.append(orjson.loads(line))
+        except orjson.JSONDecodeError:
+            _log.warning("Skipping undecodable line in %s.", LOG_PATH)
+    return entries
+
+def load_logs() -> Iterator[Dict[str, Any]]:
+    """
+    Streams execution logs from log.jsonl, one record at a time.
+    """
+    if not os.path.exists(LOG_PATH):
+        return
+    with open(LOG_PATH, "rb") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                yield orjson.loads(line)
+            except orjson.JSONDecodeError:
+                _log.warning("Skipping undecodable line in %s.", LOG_PATH)
+
+def read_logs_since(offset: int) -> Tuple[List[Dict[str, Any]], int]:
+    """
+    Reads the complete records appended after byte `offset`.
+    Returns the records and the offset to resume from; a trailing partial line is left for the next call.
+    """
+    if not os.path.exists(LOG_PATH):
+        return [], 0
+    with open(LOG_PATH, "rb") as f:
+        f.seek(offset)
+        data = f.read()
+    end = data.rfind(b"\n") + 1
+    return _parse_lines(data[:end]), offset + end
+
+def append_log(log_entry: Dict[str, Any]):
+    """
+    Appends a single execution log to log.jsonl.
+    """
+    append_logs([log_entry])
+
+def append_logs(log_entries: List[Dict[str, Any]]):
+    """
+    Appends several execution logs to log.jsonl with a single write.
+    """
+    os.makedirs(os.path.dirname(LOG_PATH), exist_ok=True) # Ensure directory exists
+    with _log_lock(exclusive=False), open(LOG_PATH, "ab") as f:
+        f.write(b"".join(orjson.dumps(entry) + b"\n" for entry in log_entries))
+
+# Rotation: `python -m agentlayer.logger rotate` moves log.jsonl to log.jsonl.1 once it grows past
+# LOG_MAX_BYTES (older backups shift up to LOG_BACKUPS), which bounds the API's startup log scan.
+LOG_MAX_BYTES = int(os.getenv("AGENTLAYER_LOG_MAX_BYTES", str(50 * 1024 * 1024)))
+LOG_BACKUPS = 3
+
+def compact_logs() -> int:
+    """
+    Rewrites log.jsonl without blank, undecodable or duplicate-uuid lines (the first record wins).
+    The rewrite goes through a temp file and os.replace, so readers never see a partial file,
+    and holds the exclusive log lock, so concurrent appends wait instead of being lost.
+    Returns the number of records kept. Run it as a maintenance command: python -m agentlayer.logger compact
     """
-    Loads execution logs from log.json.
+    if not os.path.exists(LOG_PATH):
+        return 0
+    with _log_lock(exclusive=True):
+        seen = set()
+        kept = []
+        for entry in load_logs():
+            uuid = entry.get("uuid") if isinstance(entry, dict) else None
+            if uuid is not None:
+                if uuid in seen:
+                    continue
+                seen.add(uuid)
+            kept.append(entry)
+        tmp_path = LOG_PATH + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(b"".join(orjson.dumps(entry) + b"\n" for entry in kept))
+        os.replace(tmp_path, LOG_PATH)
+    return len(kept)
+
+def _is_oversized(max_bytes: int) -> bool:
+    try:
+        return os.path.getsize(LOG_PATH) > max_bytes
+    except FileNotFoundError:
+        return False
+
+def rotate_logs(max_bytes: int = LOG_MAX_BYTES, backups: int = LOG_BACKUPS) -> bool:
+    """
+    If log.jsonl is larger than `max_bytes`, moves it to log.jsonl.1 (shifting older backups up to
+    `backups`) and starts an empty log. A file under the limit is left untouched. Safe to call from
+    several workers at once: the size is re-checked under the exclusive log lock, so only one rotates.
+    Returns True if the file was rotated.
+
+    The API only indexes log.jsonl, so rotated runs drop out of /score and /trace. Nothing rotates
+    automatically; run it as a maintenance command when that history can go:
+    python -m agentlayer.logger rotate
     """
-    log_path = "agentlayer/log.json"
-    if os.path.exists(log_path):
-        with open(log_path, "r", encoding="utf-8") as f:
+    if not _is_oversized(max_bytes):
+        return False
+    with _log_lock(exclusive=True):
+        if not _is_oversized(max_bytes):
+            return False # Another process rotated it while we waited for the lock
+        for i in range(backups - 1, 0, -1):
+            older = f"{LOG_PATH}.{i}"
+            if os.path.exists(older):
+                os.replace(older, f"{LOG_PATH}.{i + 1}")
+        if backups > 0:
+            os.replace(LOG_PATH, f"{LOG_PATH}.1")
+        open(LOG_PATH, "wb").close()
+    return True
+
+# Background writer: the workflow enqueues log entries and returns; a single task drains the queue
+# and appends in batches, at most every FLUSH_INTERVAL seconds or FLUSH_BATCH_SIZE entries.
+FLUSH_INTERVAL = 0.25 # seconds
+FLUSH_BATCH_SIZE = 64
+
+_queue: Optional[asyncio.Queue] = None
+_writer_task: Optional[asyncio.Task] = None
+
+async def _writer(queue: asyncio.Queue):
+    loop = asyncio.get_running_loop()
+    while True:
+        batch = [await queue.get()]
+        deadline = loop.time() + FLUSH_INTERVAL
+        while len(batch) < FLUSH_BATCH_SIZE:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
             try:
-                return json.load(f)
-            except json.JSONDecodeError:
-                print(f"Warning: Could not decode JSON from {log_path}. Returning empty list.")
-                return [] # Handle empty or corrupted JSON
-    return []
+                batch.append(await asyncio.wait_for(queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        try:
+            # The write runs on a worker thread so the event loop keeps serving in-flight requests.
+            await asyncio.to_thread(append_logs, batch)
+        except Exception: # Keep the writer alive; one bad batch must not stall every later log
+            _log.exception("Failed to write %d log entries to %s", len(batch), LOG_PATH)
+        finally:
+            for _ in batch:
+                queue.task_done()
+
+def _get_queue() -> asyncio.Queue:
+    global _queue, _writer_task
+    # A queue is bound to the event loop that created it; restart the writer if the loop changed.
+    if _writer_task is None or _writer_task.done() or _writer_task.get_loop() is not asyncio.get_running_loop():
+        _queue = asyncio.Queue()
+        _writer_task = asyncio.create_task(_writer(_queue))
+    return _queue
+
+def enqueue_log(log_entry: Dict[str, Any]):
+    """
+    Queues an execution log for the background writer and returns immediately.
+    Outside a running event loop the entry is appended synchronously.
+    """
+    try:
+        queue = _get_queue()
+    except RuntimeError: # no running event loop
+        append_log(log_entry)
+        return
+    queue.put_nowait(log_entry)
+
+async def flush_logs():
+    """
+    Waits until every queued log entry has been written.
+    """
+    if _queue is not None and _writer_task is not None and not _writer_task.done() \
+            and _writer_task.get_loop() is asyncio.get_running_loop():
+        await _queue.join()
+
+async def close_logs():
+    """
+    Flushes pending log entries and stops the background writer. Called from the API's shutdown hook.
+    """
+    global _queue, _writer_task
+    await flush_logs()
+    if _writer_task is not None:
+        _writer_task.cancel()
+    _queue = None
+    _writer_task = None
 
 def save_logs(logs: List[Dict[str, Any]]):
     """
-    Saves execution logs to log.json.
+    Rewrites log.jsonl with the given logs. Use append_log() for new records.
     """
-    log_path = "agentlayer/log.json"
-    os.makedirs(os.path.dirname(log_path), exist_ok=True) # Ensure directory exists
-    with open(log_path, "w", encoding="utf-8") as f:
-        json.dump(logs, f, indent=2, ensure_ascii=False) # ensure_ascii=False for Korean characters
+    os.makedirs(os.path.dirname(LOG_PATH), exist_ok=True) # Ensure directory exists
+    with _log_lock(exclusive=True), open(LOG_PATH, "wb") as f:
+        f.write(b"".join(orjson.dumps(log) + b"\n" for log in logs))
 
-if __name__ == "__main__":
-    # Ensure a dummy log.json exists for testing
+def _demo():
+    # Ensure a dummy log.jsonl exists for testing
     os.makedirs("agentlayer", exist_ok=True)
-    dummy_log_path = "agentlayer/log.json"
+    dummy_log_path = LOG_PATH
     if not os.path.exists(dummy_log_path):
         with open(dummy_log_path, "w", encoding="utf-8") as f:
-            f.write("[]")
+            f.write("")
 
     print("--- Testing logger.py ---")
 
     # Test loading empty logs
-    loaded_empty_logs = load_logs()
+    loaded_empty_logs = list(load_logs())
     print(f"Loaded empty logs: {loaded_empty_logs}") # Expected: []
 
     # Test saving new logs
@@ -51,12 +247,11 @@ if __name__ == "__main__":
         "violations": [],
         "score": 100
     }
-    logs_to_save = [new_log_entry]
-    save_logs(logs_to_save)
+    save_logs([new_log_entry])
     print(f"Saved log: {new_log_entry['uuid']}")
 
     # Test loading saved logs
-    loaded_logs_after_save = load_logs()
+    loaded_logs_after_save = list(load_logs())
     print(f"Loaded logs after save: {loaded_logs_after_save}") # Expected: [new_log_entry]
 
     # Test appending to existing logs
@@ -69,10 +264,26 @@ if __name__ == "__main__":
         "violations": [{"rule_id": "R1", "type": "keyword", "trigger": "test", "severity": "low"}],
         "score": 90
     }
-    existing_logs = load_logs()
-    existing_logs.append(another_log_entry)
-    save_logs(existing_logs)
+    append_log(another_log_entry)
     print(f"Appended log: {another_log_entry['uuid']}")
 
-    final_logs = load_logs()
+    final_logs = list(load_logs())
     print(f"Final logs: {final_logs}") # Expected: [new_log_entry, another_log_entry]
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="python -m agentlayer.logger", description="Maintain agentlayer/log.jsonl.")
+    commands = parser.add_subparsers(dest="command")
+    commands.add_parser("compact", help="Drop blank, undecodable and duplicate-uuid lines.")
+    rotate_parser = commands.add_parser("rotate", help="Rotate log.jsonl if it exceeds --max-bytes.")
+    rotate_parser.add_argument("--max-bytes", type=int, default=LOG_MAX_BYTES)
+    rotate_parser.add_argument("--backups", type=int, default=LOG_BACKUPS)
+    args = parser.parse_args()
+
+    if args.command == "compact":
+        print(f"Kept {compact_logs()} records in {LOG_PATH}.")
+    elif args.command == "rotate":
+        print(f"Rotated {LOG_PATH}." if rotate_logs(args.max_bytes, args.backups) else f"{LOG_PATH} is under {args.max_bytes} bytes; not rotated.")
+    else:
+        _demo()
@@ -1,23 +1,142 @@
 # agentlayer/rule_checker.py
 
-import json
+import functools
 import os
-from typing import Dict, Any, List
+import re
+import orjson
+from typing import Dict, Any, FrozenSet, List, Optional, Set, Tuple
+
+try:
+    import ahocorasick # pyahocorasick
+except ImportError: # Optional: fall back to a compiled regex
+    ahocorasick = None
+
+CONSTITUTION_PATH = "agentlayer/constitution.json"
+
+# Keyword hits at these severities stop a streamed LLM generation early (see KeywordStreamScanner).
+BLOCKING_SEVERITIES = frozenset({"high", "critical"})
+
+class CompiledRules(list):
+    """
+    A list of rules that also carries a keyword matcher built from them,
+    so check_violations can scan each text once regardless of keyword count,
+    plus each rule's (keyword, lowercased keyword) pairs and, for role rules,
+    a frozenset of lowercased allowed roles. The matcher is an Aho-Corasick
+    automaton, or a single compiled regex when pyahocorasick is not installed.
+    """
+    def __init__(self, rules: List[Dict[str, Any]]):
+        super().__init__(rules)
+        self.keyword_pairs = [_keyword_pairs(rule) for rule in self]
+        self.allowed_roles = [_allowed_roles(rule) for rule in self]
+        owners = _keyword_owners(self)
+        self.automaton = _build_keyword_automaton(owners)
+        self.pattern = _build_keyword_pattern(owners) if self.automaton is None else None
+
+def _keyword_pairs(rule: Dict[str, Any]) -> List[Tuple[str, str]]:
+    if rule.get("type") != "keyword":
+        return []
+    return [(keyword, keyword.lower()) for keyword in rule.get("keywords", [])]
+
+def _allowed_roles(rule: Dict[str, Any]) -> Optional[FrozenSet[str]]:
+    if rule.get("type") != "role":
+        return None
+    return frozenset(allowed.lower() for allowed in rule.get("allowed_roles", []))
+
+def _keyword_owners(rules: List[Dict[str, Any]]) -> Dict[str, Tuple[Tuple[int, str], ...]]:
+    """
+    Maps each lowercased keyword to the (rule index, keyword) pairs it belongs to.
+    """
+    owners: Dict[str, List[Tuple[int, str]]] = {}
+    for index, rule in enumerate(rules):
+        if rule.get("type") == "keyword":
+            for keyword in rule.get("keywords", []):
+                if keyword:
+                    owners.setdefault(keyword.lower(), []).append((index, keyword))
+    return {word: tuple(hits) for word, hits in owners.items()}
+
+def _build_keyword_automaton(owners: Dict[str, Tuple[Tuple[int, str], ...]]):
+    """
+    Builds an Aho-Corasick automaton over the lowercased keywords. Returns None
+    if pyahocorasick is unavailable or there are no keywords.
+    """
+    if ahocorasick is None or not owners:
+        return None
+    automaton = ahocorasick.Automaton()
+    for word, hits in owners.items():
+        automaton.add_word(word, hits)
+    automaton.make_automaton()
+    return automaton
+
+def _build_keyword_pattern(owners: Dict[str, Tuple[Tuple[int, str], ...]]):
+    """
+    Builds one regex over the lowercased keywords, plus a map from each keyword to the owners
+    of every keyword that is a prefix of it. Returns None if there are no keywords.
+    Keywords match as substrings (no word boundaries), the same as the automaton.
+    """
+    if not owners:
+        return None
+    # The lookahead matches at every position, so overlapping keywords are all found; longest-first
+    # ordering makes each match the longest keyword there, and shorter ones there are its prefixes.
+    words = sorted(owners, key=len, reverse=True)
+    pattern = re.compile("(?=(" + "|".join(map(re.escape, words)) + "))")
+    prefixes = {word: tuple(hit for other in words if word.startswith(other) for hit in owners[other]) for word in words}
+    return pattern, prefixes
+
+def _keyword_hits(rules: CompiledRules, input_text: str, output_text: str) -> Set[Tuple[int, str]]:
+    # One pass over both texts; the NUL separator keeps a keyword from matching across the boundary.
+    text = f"{input_text}\x00{output_text or ''}".lower()
+    hits = set()
+    if rules.automaton is not None:
+        for _, owners in rules.automaton.iter(text):
+            hits.update(owners)
+    else:
+        pattern, prefixes = rules.pattern
+        for match in pattern.finditer(text):
+            hits.update(prefixes[match.group(1)])
+    return hits
+
+@functools.lru_cache(maxsize=1)
+def _load_rules_cached(path: str, mtime_ns: int) -> List[Dict[str, Any]]:
+    """
+    Parses the constitution file. Keyed on (path, mtime_ns) so the parse is
+    reused until the file is edited.
+    """
+    with open(path, "rb") as f:
+        raw = f.read()
+    try:
+        data = orjson.loads(raw)
+        return CompiledRules(data.get("rules", []))
+    except orjson.JSONDecodeError:
+        print(f"Error: Could not decode JSON from {path}. Returning empty rules.")
+        return CompiledRules([])
+
+def clear_rule_cache():
+    """
+    Drops the cached constitution parse, so the next load re-reads the file.
+    """
+    _load_rules_cached.cache_clear()
+
+def rules_version() -> Optional[Tuple[str, int]]:
+    """
+    Returns the (abspath, mtime_ns) key the current constitution is cached under,
+    or None if constitution.json is missing. Changes whenever the rules may have changed.
+    """
+    constitution_path = os.path.abspath(CONSTITUTION_PATH)
+    try:
+        return constitution_path, os.stat(constitution_path).st_mtime_ns
+    except FileNotFoundError:
+        return None
 
 def load_constitution_rules() -> List[Dict[str, Any]]:
     """
     Loads constitution rules from constitution.json.
+    The parsed rules are cached and only re-read when the file's mtime changes.
+    Callers must treat the returned list as read-only.
     """
-    constitution_path = "agentlayer/constitution.json"
-    if os.path.exists(constitution_path):
-        with open(constitution_path, "r", encoding="utf-8") as f:
-            try:
-                data = json.load(f)
-                return data.get("rules", [])
-            except json.JSONDecodeError:
-                print(f"Error: Could not decode JSON from {constitution_path}. Returning empty rules.")
-                return []
-    return []
+    version = rules_version()
+    if version is None:
+        return []
+    return _load_rules_cached(*version)
 
 def check_violations(input_text: str, output_text: str, role: str, rules: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     """
@@ -25,15 +144,32 @@ def check_violations(input_text: str, output_text: str, role: str, rules: List[D
     """
     violations = []
 
-    for rule in rules:
+    # Rules from load_constitution_rules() come with a prebuilt matcher; plain lists use substring checks.
+    keyword_pairs = getattr(rules, "keyword_pairs", None)
+    allowed_roles_l = getattr(rules, "allowed_roles", None)
+    hits: Optional[Set[Tuple[int, str]]] = None
+    if getattr(rules, "automaton", None) is not None or getattr(rules, "pattern", None) is not None:
+        hits = _keyword_hits(rules, input_text, output_text)
+    else:
+        # Lowercase once per call rather than once per keyword.
+        input_l = input_text.lower()
+        output_l = (output_text or "").lower()
+    role_l = role.lower() if role is not None else None # A missing role matches no allowed role
+
+    for index, rule in enumerate(rules):
         rule_id = rule.get("id", "unknown")
         rule_type = rule.get("type")
         severity = rule.get("severity", "low")
 
         if rule_type == "keyword":
-            for keyword in rule.get("keywords", []):
-                # Case-insensitive check
-                if keyword.lower() in input_text.lower() or (output_text and keyword.lower() in output_text.lower()):
+            pairs = keyword_pairs[index] if keyword_pairs is not None else _keyword_pairs(rule)
+            for keyword, keyword_l in pairs:
+                if hits is not None:
+                    matched = (index, keyword) in hits
+                else:
+                    # Case-insensitive check
+                    matched = keyword_l in input_l or keyword_l in output_l
+                if matched:
                     violations.append({
                         "rule_id": rule_id,
                         "type": "keyword",
@@ -41,8 +177,9 @@ def check_violations(input_text: str, output_text: str, role: str, rules: List[D
                         "severity": severity
                     })
         elif rule_type == "role":
-            allowed_roles = rule.get("allowed_roles", [])
-            if role not in allowed_roles:
+            # Roles compare case-insensitively, like keywords.
+            allowed = allowed_roles_l[index] if allowed_roles_l is not None else _allowed_roles(rule)
+            if role_l not in allowed:
                 violations.append({
                     "rule_id": rule_id,
                     "type": "role",
@@ -52,10 +189,44 @@ def check_violations(input_text: str, output_text: str, role: str, rules: List[D
         # Add other rule types here if needed (e.g., "length", "format")
     return violations
 
+def _blocking_keyword_rules(rules: List[Dict[str, Any]]) -> CompiledRules:
+    # Compiled once per loaded rule set and kept on it, so each streamed request doesn't rebuild the matcher.
+    blocking = getattr(rules, "_blocking_rules", None)
+    if blocking is None:
+        blocking = CompiledRules([
+            rule for rule in rules
+            if rule.get("type") == "keyword" and rule.get("severity", "low") in BLOCKING_SEVERITIES
+        ])
+        if isinstance(rules, CompiledRules):
+            rules._blocking_rules = blocking
+    return blocking
+
+class KeywordStreamScanner:
+    """
+    Scans text as it streams in for keywords of BLOCKING_SEVERITIES rules.
+    Keeps the tail of the text seen so far, so a keyword split across chunks is still found.
+    """
+    def __init__(self, rules: List[Dict[str, Any]]):
+        self.rules = _blocking_keyword_rules(rules)
+        longest = max((len(keyword) for pairs in self.rules.keyword_pairs for keyword, _ in pairs), default=0)
+        self._overlap = max(longest - 1, 0)
+        self._tail = ""
+
+    def feed(self, chunk: str) -> Optional[str]:
+        """
+        Adds a chunk of streamed text. Returns the first blocking keyword found, or None.
+        """
+        if not chunk or (self.rules.automaton is None and self.rules.pattern is None):
+            return None
+        window = self._tail + chunk
+        self._tail = window[-self._overlap:] if self._overlap else ""
+        hits = _keyword_hits(self.rules, window, "")
+        return min(hits)[1] if hits else None
+
 if __name__ == "__main__":
     # Ensure a dummy constitution.json exists for testing
     os.makedirs("agentlayer", exist_ok=True)
-    dummy_constitution_path = "agentlayer/constitution.json"
+    dummy_constitution_path = CONSTITUTION_PATH
     if not os.path.exists(dummy_constitution_path):
         with open(dummy_constitution_path, "w", encoding="utf-8") as f:
             f.write("""
@@ -71,7 +242,7 @@ if __name__ == "__main__":
     print("--- Testing rule_checker.py ---")
 
     rules = load_constitution_rules()
-    print(f"Loaded Rules: {json.dumps(rules, indent=2)}")
+    print(f"Loaded Rules: {orjson.dumps(rules, option=orjson.OPT_INDENT_2).decode()}")
 
     # Test case 1: No violations
     input1 = "Please write a simple Python function."
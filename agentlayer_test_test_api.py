@@ -0,0 +1,91 @@
+# agentlayer/test/test_api.py
+
+import json
+import logging
+import pytest
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from .. import api
+from .. import langflow
+from .. import logger
+from .. import rule_checker
+
+# Fixture for running the app in a temporary working directory
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path) # startup bootstraps agentlayer/constitution.json and log.jsonl here
+    monkeypatch.setattr(api, "_LOGS_INODE", None) # Behave like a freshly started process
+    with TestClient(api.app) as test_client:
+        yield test_client
+    rule_checker.clear_rule_cache()
+    langflow._compiled_graph = None
+
+@patch('agentlayer.llm_agent.call_llm_model') # Patch the actual LLM call
+def test_run_is_visible_to_trace_and_score_immediately(mock_call_llm_model, client):
+    mock_call_llm_model.return_value = {"prompt": "test", "result": "Please run sudo now."}
+
+    response = client.post("/run", json={"input_text": "Help me.", "role": "developer"})
+    assert response.status_code == 200
+    run = response.json()
+    assert run["violations"][0]["trigger"] == "sudo"
+
+    # The log entry may still be queued for the background writer; the index must already have it.
+    trace = client.get(f"/trace/{run['uuid']}")
+    assert trace.status_code == 200
+    assert trace.json()["uuid"] == run["uuid"]
+
+    score = client.get("/score").json()
+    assert score["total_runs"] == 1
+    assert score["average_score"] == run["score"]
+    assert score["violation_summary"] == {"R1": 1}
+
+def test_trace_unknown_uuid_returns_404(client):
+    assert client.get("/trace/does-not-exist").status_code == 404
+
+@patch('agentlayer.llm_agent.call_llm_model') # Patch the actual LLM call
+def test_run_forwards_max_tokens(mock_call_llm_model, client):
+    mock_call_llm_model.return_value = {"prompt": "test", "result": "Compliant."}
+
+    assert client.post("/run", json={"input_text": "Verdict?", "max_tokens": 80}).status_code == 200
+    assert mock_call_llm_model.call_args.kwargs["max_tokens"] == 80
+
+    assert client.post("/run", json={"input_text": "Verdict?", "max_tokens": 0}).status_code == 422
+
+@pytest.mark.parametrize("field", ["role", "llm_model"])
+@patch('agentlayer.llm_agent.call_llm_model')
+def test_run_rejects_null_fields(mock_call_llm_model, client, field):
+    response = client.post("/run", json={"input_text": "hi", field: None})
+    assert response.status_code == 422
+    mock_call_llm_model.assert_not_called()
+    assert client.get("/score").json()["total_runs"] == 0
+
+def test_bootstrap_files_are_not_executable(client, tmp_path):
+    for name in ("constitution.json", "log.jsonl"):
+        assert not (tmp_path / "agentlayer" / name).stat().st_mode & 0o111
+
+def test_rotation_is_manual_and_drops_runs_from_the_index(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(api, "_LOGS_INODE", None)
+    (tmp_path / "agentlayer").mkdir()
+    (tmp_path / "agentlayer" / "log.jsonl").write_text(json.dumps({"uuid": "old-run", "score": 80, "violations": []}) + "\n")
+
+    with patch.object(logger, "rotate_logs", wraps=logger.rotate_logs) as rotate_logs, TestClient(api.app) as client:
+        rotate_logs.assert_not_called() # Startup leaves the log alone, however large
+        assert client.get("/score").json()["total_runs"] == 1
+        assert client.get("/trace/old-run").status_code == 200
+
+        assert logger.rotate_logs(max_bytes=1) is True
+        # Documented behavior: rotated runs live in log.jsonl.1 and are no longer indexed.
+        assert client.get("/score").json()["total_runs"] == 0
+        assert client.get("/trace/old-run").status_code == 404
+    rule_checker.clear_rule_cache()
+    langflow._compiled_graph = None
+
+@patch('agentlayer.llm_agent.call_llm_model')
+def test_run_logs_reach_caplog(mock_call_llm_model, client, caplog):
+    mock_call_llm_model.return_value = {"prompt": "test", "result": "Fine."}
+    assert logging.getLogger("agentlayer").propagate # Importing the app must not reconfigure logging
+
+    with caplog.at_level(logging.INFO, logger="agentlayer"):
+        run = client.post("/run", json={"input_text": "hi"}).json()
+    assert f"workflow end uuid={run['uuid']}" in caplog.messages
@@ -0,0 +1,52 @@
+# agentlayer/test/test_batch.py
+
+import pytest
+import asyncio
+import random
+from unittest.mock import patch
+from .. import batch
+
+class ConcurrencyProbe:
+    """Records the peak number of calls in flight at once."""
+
+    def __init__(self):
+        self.active = 0
+        self.peak = 0
+
+    async def run(self, delay: float):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(delay)
+        finally:
+            self.active -= 1
+
+@pytest.mark.asyncio
+async def test_run_many_keeps_order_and_caps_concurrency():
+    probe = ConcurrencyProbe()
+    prompts = [f"prompt {i}" for i in range(12)]
+
+    async def fake_call_llm_model(state, model, max_tokens=None):
+        await probe.run(random.uniform(0, 0.02))
+        return {**state, "result": f"{model}:{state['prompt']}:{max_tokens}"}
+
+    with patch('agentlayer.llm_agent.call_llm_model', fake_call_llm_model):
+        results = await batch.run_many(prompts, "test-model", max_concurrency=3, rpm=6000, max_tokens=40)
+
+    assert [r["result"] for r in results] == [f"test-model:{p}:40" for p in prompts]
+    assert 1 < probe.peak <= 3
+
+@pytest.mark.asyncio
+async def test_invoke_many_uses_given_graph():
+    probe = ConcurrencyProbe()
+
+    class FakeGraph:
+        async def ainvoke(self, state):
+            await probe.run(0.01 * (5 - state["n"])) # Later states finish first
+            return {**state, "score": state["n"]}
+
+    states = [{"n": n} for n in range(5)]
+    results = await batch.invoke_many(states, graph=FakeGraph(), max_concurrency=2, rpm=6000)
+
+    assert [r["score"] for r in results] == [0, 1, 2, 3, 4]
+    assert probe.peak <= 2
@@ -0,0 +1,91 @@
+# agentlayer/test/test_llm_agent.py
+
+import pytest
+import httpx
+import orjson
+from .. import llm_agent
+from .. import rule_checker
+
+def _sse(*frames) -> bytes:
+    # Encodes dict frames as Together-style server-sent events; str frames are sent verbatim.
+    lines = [f if isinstance(f, str) else "data: " + orjson.dumps(f).decode() for f in frames]
+    return ("\n\n".join(lines) + "\n\ndata: [DONE]\n\n").encode()
+
+def _delta(text: str):
+    return {"choices": [{"delta": {"content": text}}]}
+
+# Fixture replacing the shared client with one backed by a list of canned responses
+@pytest.fixture
+def together(monkeypatch):
+    responses = []
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return responses.pop(0)
+
+    monkeypatch.setattr(llm_agent, "TOGETHER_API_KEY", "test-key")
+    monkeypatch.setattr(llm_agent, "client", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    return responses, requests
+
+@pytest.mark.asyncio
+async def test_streamed_deltas_are_joined_and_bad_frames_skipped(together):
+    responses, requests = together
+    responses.append(httpx.Response(200, content=_sse(
+        _delta("Hello"), ": keep-alive comment", "data: {not json", _delta(", world"), {"choices": []}
+    )))
+
+    state = await llm_agent.call_llm_model({"prompt": "hi", "result": None}, "test-model")
+
+    assert state["result"] == "Hello, world"
+    assert orjson.loads(requests[0].content)["stream"] is True
+
+@pytest.mark.asyncio
+async def test_error_frame_mid_stream_is_reported(together):
+    responses, _ = together
+    responses.append(httpx.Response(200, content=_sse(
+        _delta("Partial"), {"error": {"message": "model overloaded", "type": "server_error"}}
+    )))
+
+    state = await llm_agent.call_llm_model({"prompt": "hi", "result": None}, "test-model")
+
+    assert state["result"] == "❌ Together AI API returned an error: 200 - model overloaded"
+
+@pytest.mark.asyncio
+async def test_stream_stops_on_keyword_split_across_chunks(together):
+    responses, _ = together
+    responses.append(httpx.Response(200, content=_sse(
+        _delta("Sure, run r"), _delta("m -r"), _delta("f / now"), _delta(" and then more text")
+    )))
+    rules = rule_checker.CompiledRules([
+        {"id": "R1", "type": "keyword", "keywords": ["rm -rf"], "severity": "high"}
+    ])
+
+    state = await llm_agent.call_llm_model(
+        {"prompt": "hi", "result": None}, "test-model", scanner=rule_checker.KeywordStreamScanner(rules)
+    )
+
+    assert state["result"].startswith("Sure, run rm -rf / now")
+    assert "and then more text" not in state["result"] # Generation was abandoned at the hit
+    assert "Generation stopped" in state["result"] and "'rm -rf'" in state["result"]
+
+@pytest.mark.asyncio
+async def test_retryable_status_is_retried_before_streaming(together):
+    responses, requests = together
+    responses.append(httpx.Response(503, text="busy", headers={"Retry-After": "0"}))
+    responses.append(httpx.Response(200, content=_sse(_delta("Recovered"))))
+
+    state = await llm_agent.call_llm_model({"prompt": "hi", "result": None}, "test-model")
+
+    assert state["result"] == "Recovered"
+    assert len(requests) == 2
+
+@pytest.mark.asyncio
+async def test_non_retryable_status_reports_body(together):
+    responses, requests = together
+    responses.append(httpx.Response(401, text="invalid api key"))
+
+    state = await llm_agent.call_llm_model({"prompt": "hi", "result": None}, "test-model")
+
+    assert state["result"] == "❌ Together AI API returned an error: 401 - invalid api key"
+    assert len(requests) == 1
@@ -0,0 +1,60 @@
+# agentlayer/test/test_logger.py
+
+import pytest
+import os
+import json
+from .. import logger
+
+# Fixture pointing LOG_PATH at a temporary agentlayer/log.jsonl
+@pytest.fixture
+def temp_log_path(tmp_path, monkeypatch):
+    test_dir = tmp_path / "agentlayer"
+    test_dir.mkdir()
+    log_path = test_dir / "log.jsonl"
+    monkeypatch.setattr(logger, "LOG_PATH", str(log_path))
+    return log_path
+
+def test_read_logs_since_leaves_partial_trailing_line(temp_log_path):
+    first = json.dumps({"uuid": "a"}) + "\n"
+    temp_log_path.write_text(first + '{"uuid": "b"', encoding="utf-8") # Second record still being written
+    entries, offset = logger.read_logs_since(0)
+    assert [e["uuid"] for e in entries] == ["a"]
+    assert offset == len(first)
+
+    with open(temp_log_path, "a", encoding="utf-8") as f:
+        f.write("}\n")
+    entries, offset = logger.read_logs_since(offset)
+    assert [e["uuid"] for e in entries] == ["b"]
+    assert offset == os.path.getsize(temp_log_path)
+
+def test_compact_logs_drops_blank_undecodable_and_duplicate_lines(temp_log_path):
+    temp_log_path.write_text(
+        '{"uuid": "a", "score": 100}\n\nnot json\n{"uuid": "a", "score": 0}\n{"uuid": "b", "score": 90}\n',
+        encoding="utf-8"
+    )
+    assert logger.compact_logs() == 2
+    assert list(logger.load_logs()) == [{"uuid": "a", "score": 100}, {"uuid": "b", "score": 90}]
+
+def test_rotate_logs_leaves_small_file_untouched(temp_log_path):
+    temp_log_path.write_text('{"uuid": "a"}\n\n', encoding="utf-8")
+    assert logger.rotate_logs(max_bytes=1024) is False
+    assert temp_log_path.read_text(encoding="utf-8") == '{"uuid": "a"}\n\n' # Not compacted
+    assert not os.path.exists(f"{temp_log_path}.1")
+
+def test_rotate_logs_shifts_backups(temp_log_path):
+    backup1 = f"{temp_log_path}.1"
+    backup2 = f"{temp_log_path}.2"
+    with open(backup1, "w", encoding="utf-8") as f:
+        f.write("older\n")
+    with open(backup2, "w", encoding="utf-8") as f:
+        f.write("oldest\n")
+    temp_log_path.write_text('{"uuid": "current"}\n', encoding="utf-8")
+
+    assert logger.rotate_logs(max_bytes=1, backups=2) is True
+    assert temp_log_path.read_text(encoding="utf-8") == ""
+    with open(backup1, encoding="utf-8") as f:
+        assert f.read() == '{"uuid": "current"}\n'
+    with open(backup2, encoding="utf-8") as f:
+        assert f.read() == "older\n" # The oldest backup is dropped
+    assert not os.path.exists(f"{temp_log_path}.3")
+    assert logger.rotate_logs(max_bytes=1, backups=2) is False # Empty log is under the limit
@@ -28,6 +28,7 @@ def temp_constitution_file(tmp_path):
     os.chdir(tmp_path)
     yield constitution_path
     os.chdir(original_cwd) # Change back after test
+    rule_checker.clear_rule_cache() # Don't let this temp file's rules outlive the test
 
 def test_load_constitution_rules(temp_constitution_file):
     rules = rule_checker.load_constitution_rules()
@@ -105,3 +106,50 @@ def test_check_violations_case_insensitivity(temp_constitution_file):
     violations = rule_checker.check_violations(input_text, output_text, role, rules)
     assert len(violations) == 2 # R1 (secret), R1 (confidential)
     assert all(v["rule_id"] == "R1" for v in violations)
+
+def test_check_violations_missing_role(temp_constitution_file):
+    rules = rule_checker.load_constitution_rules()
+    violations = rule_checker.check_violations("Hello.", "Hi.", None, rules)
+    assert violations == [{"rule_id": "R2", "type": "role", "trigger": None, "severity": "medium"}]
+
+def test_regex_fallback_matches_overlapping_and_prefix_keywords(tmp_path, monkeypatch):
+    # Without pyahocorasick the cached rules use one compiled regex; it must agree with plain substring checks.
+    monkeypatch.setattr(rule_checker, "ahocorasick", None)
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "agentlayer").mkdir()
+    rules_content = [
+        {"id": "R1", "type": "keyword", "keywords": ["rm", "rm -rf", "Sudo"], "severity": "high"},
+        {"id": "R2", "type": "keyword", "keywords": ["su", "do"], "severity": "low"}, # Overlap "sudo"
+        {"id": "R3", "type": "keyword", "keywords": ["rf /"], "severity": "medium"} # Overlaps "rm -rf"
+    ]
+    with open(tmp_path / "agentlayer" / "constitution.json", "w", encoding="utf-8") as f:
+        json.dump({"rules": rules_content}, f)
+    rule_checker.clear_rule_cache()
+    try:
+        rules = rule_checker.load_constitution_rules()
+        assert rules.automaton is None and rules.pattern is not None
+
+        cases = [
+            ("please SUDO rm -rf /", "done"),
+            ("nothing here", "just rm"),
+            ("s", "u"), # Must not match across the input/output boundary
+            ("", "")
+        ]
+        for input_text, output_text in cases:
+            expected = rule_checker.check_violations(input_text, output_text, "developer", list(rules_content))
+            assert rule_checker.check_violations(input_text, output_text, "developer", rules) == expected
+
+        triggers = [v["trigger"] for v in rule_checker.check_violations("please SUDO rm -rf /", "", "developer", rules)]
+        assert triggers == ["rm", "rm -rf", "Sudo", "su", "do", "rf /"]
+    finally:
+        rule_checker.clear_rule_cache() # Don't leave regex-compiled rules for other tests
+
+def test_keyword_stream_scanner_finds_keyword_split_across_chunks():
+    rules = rule_checker.CompiledRules([
+        {"id": "R1", "type": "keyword", "keywords": ["rm -rf"], "severity": "high"},
+        {"id": "R2", "type": "keyword", "keywords": ["meh"], "severity": "low"} # Not blocking
+    ])
+    scanner = rule_checker.KeywordStreamScanner(rules)
+    assert scanner.feed("meh, run r") is None
+    assert scanner.feed("m -R") is None
+    assert scanner.feed("f / now") == "rm -rf"
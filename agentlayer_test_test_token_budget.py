@@ -0,0 +1,39 @@
+# agentlayer/test/test_token_budget.py
+
+import pytest
+from .. import token_budget
+
+class FakeEncoding:
+    """Whitespace tokenizer that, like tiktoken, raises on special tokens unless called with disallowed_special=()."""
+
+    def encode(self, text, disallowed_special="all"):
+        if disallowed_special == "all" and "<|endoftext|>" in text:
+            raise ValueError("Encountered text corresponding to disallowed special token")
+        return text.split(" ")
+
+    def decode(self, tokens):
+        return " ".join(tokens)
+
+@pytest.fixture(params=["tiktoken", "fallback"])
+def encoding(request, monkeypatch):
+    fake = FakeEncoding() if request.param == "tiktoken" else None
+    monkeypatch.setattr(token_budget, "load_encoding", lambda: fake)
+    return fake
+
+def test_short_prompt_is_unchanged(encoding):
+    text = "Summarize this <|endoftext|> please"
+    assert token_budget.trim_prompt(text, max_in=100) == text
+
+def test_long_prompt_keeps_head_and_tail(encoding):
+    words = [f"w{i}" for i in range(400)]
+    text = " ".join(["HEAD"] + words + ["TAIL"])
+    trimmed = token_budget.trim_prompt(text, max_in=20)
+    assert trimmed.startswith("HEAD")
+    assert trimmed.endswith("TAIL")
+    assert token_budget.TRIM_MARKER in trimmed
+    assert len(trimmed) < len(text)
+
+def test_special_tokens_are_plain_text(encoding):
+    text = "<|endoftext|> " * 200
+    trimmed = token_budget.trim_prompt(text, max_in=10)
+    assert token_budget.TRIM_MARKER in trimmed
@@ -0,0 +1,48 @@
+# agentlayer/token_budget.py
+
+import functools
+
+try:
+    import tiktoken
+except ImportError: # Optional: fall back to a characters-per-token estimate
+    tiktoken = None
+
+# Output cap when a request doesn't set max_tokens. Together's latency scales with generated
+# tokens, so callers that only need a short answer should pass a smaller cap.
+DEFAULT_MAX_TOKENS = 512
+
+DEFAULT_MAX_INPUT_TOKENS = 1600
+CHARS_PER_TOKEN = 4 # Rough estimate for English text when tiktoken is unavailable
+TRIM_MARKER = "\n...\n"
+
+@functools.lru_cache(maxsize=1)
+def load_encoding():
+    """
+    Returns the cl100k_base encoding, or None without tiktoken. The first call may download the
+    encoding file, so the API calls this from its startup hook rather than on the first request.
+    """
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception: # e.g. the encoding file can't be downloaded
+        return None
+
+def trim_prompt(text: str, max_in: int = DEFAULT_MAX_INPUT_TOKENS) -> str:
+    """
+    Truncates `text` to about `max_in` tokens by cutting the middle, keeping the head and tail
+    where instructions and the actual question usually sit. Short prompts are returned unchanged.
+    """
+    encoding = load_encoding()
+    if encoding is None:
+        max_chars = max_in * CHARS_PER_TOKEN
+        if len(text) <= max_chars:
+            return text
+        head = max_chars // 2
+        return text[:head] + TRIM_MARKER + text[len(text) - (max_chars - head):]
+
+    tokens = encoding.encode(text, disallowed_special=()) # Treat "<|endoftext|>" etc. in user text as plain text
+    if len(tokens) <= max_in:
+        return text
+    head = max_in // 2
+    return encoding.decode(tokens[:head]) + TRIM_MARKER + encoding.decode(tokens[len(tokens) - (max_in - head):])